@@ -1,18 +1,33 @@
 import pandas as pd
-import pandas_ta as ta
+import numpy as np
+from numba import njit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
 import traceback
 from datetime import datetime, timedelta
 import ccxt.async_support as ccxt
+import ccxt.pro as ccxtpro
+import aiohttp
+import certifi
+import ssl
 import asyncio
-import json
+import copy
+from collections import deque, namedtuple
+from itertools import islice
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 import os
+import time
 
 # Load configuration from JSON
 config_path = 'config.json'
 if os.path.exists(config_path):
-    with open(config_path) as f:
-        cfg = json.load(f)
+    with open(config_path, 'rb') as f:
+        cfg = json_loads(f.read())
     strategy_cfg = cfg.get('strategy', {})
     timeframes = cfg.get('timeframes', ['15m','30m','1h','2h','4h','6h'])
     symbols = cfg.get('symbols', ['BTC/USDT'])
@@ -33,17 +48,30 @@ else:
     timeframes = ['15m','30m','1h','2h','4h','6h']
     symbols = ['BTC/USDT']
 
-# Extract parameters
-leverage = strategy_cfg['leverage']
-fixed_position_size_usd = strategy_cfg['fixed_size_usd']
-sl_pct = strategy_cfg['sl_pct']
-tp_pct = strategy_cfg['tp_pct']
-ob_level = strategy_cfg['ob_level']
-os_level = strategy_cfg['os_level']
-os_level3 = strategy_cfg['os_level3']
-wt_div_ob = strategy_cfg['wt_div_ob']
-wt_div_os = strategy_cfg['wt_div_os']
-commission_pct = strategy_cfg.get('commission_pct', 0.0004)
+# Extract parameters into one immutable record, passed to whatever needs it
+StrategyCfg = namedtuple('StrategyCfg', [
+    'leverage', 'fixed_size_usd', 'sl_pct', 'tp_pct', 'ob_level', 'os_level',
+    'os_level3', 'wt_div_ob', 'wt_div_os', 'commission_pct'
+])
+strategy = StrategyCfg(
+    leverage=strategy_cfg['leverage'],
+    fixed_size_usd=strategy_cfg['fixed_size_usd'],
+    sl_pct=strategy_cfg['sl_pct'],
+    tp_pct=strategy_cfg['tp_pct'],
+    ob_level=strategy_cfg['ob_level'],
+    os_level=strategy_cfg['os_level'],
+    os_level3=strategy_cfg['os_level3'],
+    wt_div_ob=strategy_cfg['wt_div_ob'],
+    wt_div_os=strategy_cfg['wt_div_os'],
+    commission_pct=strategy_cfg.get('commission_pct', 0.0004)
+)
+
+# Credentials come from the environment only, read once at startup
+api_key = os.environ.get("BINANCE_API_KEY")
+api_secret = os.environ.get("BINANCE_API_SECRET")
+
+# Raw exchange ids of the configured symbols, e.g. BTC/USDT -> BTCUSDT
+symbol_ids = {s: s.replace('/', '') for s in symbols}
 
 # WaveTrend and MFI/RSI parameters
 wt_channel_len = 9
@@ -54,61 +82,220 @@ rsi_oversold = 30
 mfi_period = 60
 mfi_multiplier = 150
 
-# Setup logging
+# Prices below min_price are treated as bad data (BTC/USDT in 2025); SL/TP
+# further than max_protect_dist from the entry are pulled back to it
+min_price = 50000
+max_protect_dist = 0.05
+# Pause after a position closes before the symbol is scanned again
+cooldown = timedelta(minutes=30)
+
+# Seconds a fetch_positions snapshot is reused
+positions_ttl = 0.5
+# While the account stream is pushing position updates, fetch_positions is
+# only a periodic sanity check
+positions_resync = 300
+
+# Candles kept in memory per (symbol, timeframe) kline stream
+candle_buffer = 300
+# Seconds to let the other streams report after a candle closes, so a shared
+# boundary (e.g. 00:00 closing every timeframe) triggers one rescan, not several
+candle_settle = 2.0
+
+# Pooled HTTPS connections outlive the 60s cycle and are pinged every
+# keepalive_interval seconds, so orders don't pay for a fresh TCP+TLS handshake
+keepalive_timeout = 90
+keepalive_interval = 30
+# Resolved API hosts are reused for this many seconds (aiohttp defaults to 10)
+dns_cache_ttl = 300
+
+# Setup logging: records are queued and a listener thread writes trades.log,
+# so file I/O never blocks the event loop
 datetime_fmt = '%Y-%m-%d %H:%M:%S'
-logging.basicConfig(
-    filename="trades.log",
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt=datetime_fmt,
-)
+log_file = logging.FileHandler("trades.log")
+log_file.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datetime_fmt))
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, log_file)
+# The queued record carries only the rendered message; log_file adds the prefix
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+# Per-timeframe indicator dumps are DEBUG; set LOG_LEVEL=DEBUG to see them
+log_level_name = os.environ.get("LOG_LEVEL", "INFO").upper()
+log_level = logging.getLevelNamesMapping().get(log_level_name, logging.INFO)
+logging.basicConfig(
+    level=log_level,
+    handlers=[queue_handler],
+)
+log_listener.start()
+# Flush whatever is still queued on exit
+atexit.register(log_listener.stop)
+# Numba logs its compiler passes at DEBUG; keep them out of trades.log
+logging.getLogger('numba').setLevel(logging.WARNING)
+# Reported once the handlers are up; basicConfig would raise on the bad name
+if log_level_name not in logging.getLevelNamesMapping():
+    logging.warning("Unknown LOG_LEVEL %r; using INFO", log_level_name)
 logging.info("Starting bot at %s", datetime.now().strftime(datetime_fmt))
 
+# Utility: backoff state for one exchange endpoint, shared across retry calls
+class Backoff:
+    def __init__(self, base=1.0, cap=30.0):
+        self.base = base
+        self.cap = cap
+        self.errs = 0
+
+    def success(self):
+        self.errs = 0
+
+    def failure(self, error):
+        self.errs += 1
+        if isinstance(error, (ccxt.DDoSProtection, ccxt.RateLimitExceeded)):
+            # Throttled: back off hard so repeated 429s don't escalate into an IP ban
+            return min(self.cap, self.base * 2 ** self.errs)
+        # Network blips retry quickly at first, then slow down if they persist
+        return min(self.cap, self.base * 2 ** max(0, self.errs - 2))
+
+# Keyed by the bound ccxt method, i.e. per client and endpoint
+backoffs = {}
+
+# Rejections that come back the same on every attempt; retrying only delays them
+terminal_errors = (ccxt.InvalidOrder, ccxt.InsufficientFunds, ccxt.AuthenticationError, ccxt.BadRequest)
+
 # Utility: retry wrapper
-async def retry(coro, *args, retries=3, delay=2, **kwargs):
+async def retry(coro, *args, retries=3, **kwargs):
+    backoff = backoffs.get(coro)
+    if backoff is None:
+        backoff = backoffs[coro] = Backoff()
     for i in range(retries):
         try:
-            return await coro(*args, **kwargs)
+            result = await coro(*args, **kwargs)
+            backoff.success()
+            return result
+        except terminal_errors:
+            raise
         except Exception as e:
+            wait = backoff.failure(e)
             if i < retries - 1:
                 logging.warning(f"Retry {i+1}/{retries} failed: {str(e)}")
-                await asyncio.sleep(delay)
+                await asyncio.sleep(wait)
             else:
                 raise
 
-# Utility: round price to tick size
-def round_to_tick(price, tick_size):
-    return round(price / tick_size) * tick_size
+# Utility: round price to tick size (inv_tick = 1 / tick_size, cached with the market info)
+def round_to_tick(price, tick_size, inv_tick):
+    # Half away from zero via int() truncation, skipping round()'s banker's-rounding path
+    return int(price * inv_tick + (0.5 if price >= 0 else -0.5)) * tick_size
+
+# Per-symbol market metadata, built once per session by get_market_info
+MarketInfo = namedtuple(
+    'MarketInfo', ['price_precision', 'quantity_precision', 'tick_size', 'inv_tick', 'min_quantity']
+)
+
+# Preallocated candle store for one kline stream. Each row is written twice,
+# at slot and slot + size, so the newest n rows are always one contiguous view.
+class CandleRing:
+    def __init__(self, size):
+        self.size = size
+        self.rows = np.empty((2 * size, 6), dtype=np.float64)  # open time, o, h, l, c, v
+        self.count = 0  # candles pushed since the last clear()
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def clear(self):
+        self.count = 0
+
+    def last_time(self):
+        return self.rows[(self.count - 1) % self.size, 0]
+
+    def push(self, candle):
+        slot = self.count % self.size
+        self.rows[slot] = candle
+        self.rows[slot + self.size] = candle
+        self.count += 1
+
+    def replace_last(self, candle):
+        slot = (self.count - 1) % self.size
+        self.rows[slot] = candle
+        self.rows[slot + self.size] = candle
+
+    def tail(self, n):
+        # View of the newest min(n, len) rows, oldest first
+        n = min(n, len(self))
+        end = (self.count - 1) % self.size + 1
+        if end < n:
+            end += self.size
+        return self.rows[end - n:end]
 
 # Binance client using CCXT
 class BinanceClient:
-    def __init__(self, api_key, api_secret, sandbox_mode=True):
+    def __init__(self, api_key, api_secret, sandbox_mode=True, max_concurrency=10):
+        # One keep-alive session shared by the REST instances; ccxt leaves
+        # sessions it didn't create open, so close() shuts it down
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl,
+            enable_cleanup_closed=True,
+        ))
         self.exchange = ccxt.binanceusdm({
             'apiKey': api_key,
             'secret': api_secret,
             'enableRateLimit': True,
+            'session': self.session,
         })
         self.exchange.set_sandbox_mode(sandbox_mode)
         self.markets = None
-        # Separate instance for live price data
-        self.live_exchange = ccxt.binanceusdm({'enableRateLimit': True})
-        self.live_exchange.set_sandbox_mode(False)
+        self._market_cache = {}
+        # (monotonic fetch time, {exchange id: contracts}); -inf means never fetched
+        self._positions_cache = (float('-inf'), {})
+        self._positions_lock = asyncio.Lock()
+        self.protective_orders = {}  # {symbol: {'sl_id': ..., 'tp_id': ...}} placed by this client
+        # Price data always comes from the live market; a separate instance
+        # is only needed while orders go to the sandbox
+        if sandbox_mode:
+            self.live_exchange = ccxt.binanceusdm({'enableRateLimit': True, 'session': self.session})
+            self.live_exchange.set_sandbox_mode(False)
+        else:
+            self.live_exchange = self.exchange
+        # Caps in-flight requests for batched fetches to stay within the weight budget
+        self.request_slots = asyncio.Semaphore(max_concurrency)
+        # Kline streams share one websocket connection to the live market
+        self.stream_exchange = ccxtpro.binanceusdm({'enableRateLimit': True})
+        self.candles = {}  # {(symbol, timeframe): CandleRing}
+        self.candle_closed = asyncio.Event()  # set whenever a streamed candle closes
+        # Position changes from the user data stream, on the same account as self.exchange
+        self.account_stream = ccxtpro.binanceusdm({
+            'apiKey': api_key,
+            'secret': api_secret,
+            'enableRateLimit': True,
+        })
+        self.account_stream.set_sandbox_mode(sandbox_mode)
+        self._positions_live = False  # True while the account stream is delivering
+        self._position_updates = {}  # {exchange id: (monotonic time, contracts)} from the stream
+        self._tasks = []  # background streams and keep-alive pings
 
     async def load_markets(self):
         if not self.markets:
             self.markets = await retry(self.exchange.load_markets)
+            self._market_cache.clear()
 
     async def get_market_info(self, symbol):
+        info = self._market_cache.get(symbol)
+        if info:
+            return info
         await self.load_markets()
         market = self.markets.get(symbol)
         if not market:
             raise ValueError(f"Market {symbol} not found")
-        return {
-            'price_precision': market['precision']['price'],
-            'quantity_precision': market['precision']['amount'],
-            'tick_size': market['limits']['price']['min'],
-            'min_quantity': market['limits']['amount']['min']
-        }
+        tick_size = market['limits']['price']['min']
+        info = MarketInfo(
+            price_precision=market['precision']['price'],
+            quantity_precision=market['precision']['amount'],
+            tick_size=tick_size,
+            inv_tick=1.0 / tick_size,
+            min_quantity=market['limits']['amount']['min']
+        )
+        self._market_cache[symbol] = info
+        return info
 
     async def fetch_balance(self):
         try:
@@ -121,43 +308,212 @@ class BinanceClient:
     async def fetch_ohlcv(self, symbol, timeframe='4h', limit=100):
         try:
             # Use live exchange with klines endpoint
-            symbol_formatted = symbol.replace('/', '')  # e.g., BTC/USDT -> BTCUSDT
+            symbol_formatted = symbol_ids[symbol]
             klines = await retry(self.live_exchange.fapiPublicGetKlines, params={
                 'symbol': symbol_formatted,
                 'interval': timeframe,
                 'limit': limit
             })
-            # Process klines into DataFrame with explicit float conversion
-            data = [{
-                'timestamp': pd.to_datetime(int(kline[0]), unit='ms'),
-                'open': float(kline[1]),
-                'high': float(kline[2]),
-                'low': float(kline[3]),
-                'close': float(kline[4]),
-                'volume': float(kline[5])
-            } for kline in klines]
-            df = pd.DataFrame(data)
-            # Validate price data
-            latest_price = df['close'].iloc[-1]
-            if latest_price < 50000:  # Threshold for BTC/USDT in 2025
-                logging.warning(f"Unrealistic price detected: {latest_price} for {symbol} on {timeframe}")
-            return df
+            # Convert the klines column-wise instead of row by row
+            open_time = np.fromiter((k[0] for k in klines), dtype=np.int64, count=len(klines))
+            ohlcv = np.array(klines, dtype=object)[:, 1:6].astype(np.float64)
+            return self._ohlcv_frame(symbol, timeframe, open_time, ohlcv)
         except Exception as e:
             logging.error(f"Failed to fetch OHLCV for {symbol} on {timeframe}: {str(e)}")
             return pd.DataFrame()
 
+    def _ohlcv_frame(self, symbol, timeframe, open_time, ohlcv):
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(open_time, unit='ms'),
+            'open': ohlcv[:, 0],
+            'high': ohlcv[:, 1],
+            'low': ohlcv[:, 2],
+            'close': ohlcv[:, 3],
+            'volume': ohlcv[:, 4]
+        })
+        # Validate price data
+        latest_price = df['close'].iloc[-1]
+        if latest_price < min_price:
+            logging.warning(f"Unrealistic price detected: {latest_price} for {symbol} on {timeframe}")
+        return df
+
+    def start_keepalive(self):
+        self._tasks.append(asyncio.create_task(self.keepalive()))
+
+    async def keepalive(self):
+        # A cheap weight-1 request keeps the pooled connection to the order endpoint warm
+        while True:
+            await asyncio.sleep(keepalive_interval)
+            try:
+                await self.exchange.fapiPublicGetPing()
+            except Exception as e:
+                logging.warning(f"Keep-alive ping failed: {str(e)}")
+
+    def start_kline_streams(self, pairs):
+        for symbol, timeframe in pairs:
+            self._tasks.append(asyncio.create_task(self.watch_klines(symbol, timeframe)))
+
+    async def watch_klines(self, symbol, timeframe):
+        # Keep self.candles[symbol, timeframe] current from the kline stream
+        candles = self.candles.setdefault((symbol, timeframe), CandleRing(candle_buffer))
+        backoff = Backoff()
+        while True:
+            try:
+                if not candles:
+                    klines = await retry(self.live_exchange.fapiPublicGetKlines, params={
+                        'symbol': symbol_ids[symbol],
+                        'interval': timeframe,
+                        'limit': candle_buffer
+                    })
+                    for k in klines:
+                        candles.push([float(x) for x in k[:6]])
+                for candle in await self.stream_exchange.watch_ohlcv(symbol, timeframe):
+                    # The stream repeats the forming candle until it closes
+                    if candles and candle[0] == candles.last_time():
+                        candles.replace_last(candle)
+                    elif not candles or candle[0] > candles.last_time():
+                        # A newer open time means the previous candle has closed
+                        if candles:
+                            self.candle_closed.set()
+                        candles.push(candle)
+                backoff.success()
+            except Exception as e:
+                # Reseed from REST after reconnecting so no candles go missing
+                candles.clear()
+                wait = backoff.failure(e)
+                logging.warning(f"Kline stream for {symbol} on {timeframe} failed: {str(e)}; retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+
+    async def wait_candle_close(self, timeout):
+        # Return shortly after a streamed candle closes, or after timeout seconds
+        try:
+            await asyncio.wait_for(self.candle_closed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return
+        # Closes still arriving now are picked up by the rescan the caller starts
+        await asyncio.sleep(candle_settle)
+
+    def candle_frame(self, symbol, timeframe, limit=100):
+        # Last `limit` streamed candles as a fetch_ohlcv frame, or None until the stream is seeded
+        candles = self.candles.get((symbol, timeframe))
+        if not candles:
+            return None
+        rows = candles.tail(limit)
+        return self._ohlcv_frame(symbol, timeframe, rows[:, 0].astype(np.int64), rows[:, 1:6])
+
+    async def fetch_ohlcv_many(self, pairs, limit=100):
+        # Fetch several (symbol, timeframe) pairs concurrently; results keep the order of pairs
+        async def fetch_one(symbol, timeframe):
+            df = self.candle_frame(symbol, timeframe, limit)
+            if df is not None:
+                return df
+            async with self.request_slots:
+                return await self.fetch_ohlcv(symbol, timeframe, limit)
+        return await asyncio.gather(*(fetch_one(s, tf) for s, tf in pairs))
+
+    async def fetch_position_amounts(self):
+        # One fetch_positions call serves every symbol for positions_ttl seconds
+        async with self._positions_lock:
+            fetched_at, amounts = self._positions_cache
+            ttl = positions_resync if self._positions_live else positions_ttl
+            if time.monotonic() - fetched_at < ttl:
+                return amounts
+            requested_at = time.monotonic()
+            positions = await retry(self.exchange.fetch_positions)
+            # Index by the raw exchange id (e.g. BTCUSDT); p['symbol'] is the unified BTC/USDT:USDT
+            amounts = {
+                p['info']['symbol']: float(p['contracts']) if p['contracts'] else 0.0
+                for p in positions
+            }
+            # Stream updates that arrived while the request was in flight are newer
+            for market_id, (updated_at, contracts) in self._position_updates.items():
+                if updated_at >= requested_at:
+                    amounts[market_id] = contracts
+            self._positions_cache = (time.monotonic(), amounts)
+            return amounts
+
+    def start_position_stream(self):
+        self._tasks.append(asyncio.create_task(self.watch_positions()))
+
+    async def watch_positions(self):
+        # Apply ACCOUNT_UPDATE position changes to the snapshot between REST reads;
+        # the first result is ccxt's own REST snapshot of every position
+        backoff = Backoff()
+        while True:
+            try:
+                for p in await self.account_stream.watch_positions():
+                    market_id = self.account_stream.market_id(p['symbol'])
+                    contracts = float(p['contracts']) if p['contracts'] else 0.0
+                    self._positions_cache[1][market_id] = contracts
+                    self._position_updates[market_id] = (time.monotonic(), contracts)
+                self._positions_live = True
+                backoff.success()
+            except Exception as e:
+                # Back to short-lived REST snapshots until the stream recovers
+                self._positions_live = False
+                wait = backoff.failure(e)
+                logging.warning(f"Position stream failed: {str(e)}; retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+
+    def invalidate_positions(self):
+        self._positions_cache = (float('-inf'), {})
+
+    async def load_protective_orders(self, symbol):
+        # Startup reconciliation: adopt SL/TP orders left by an earlier run
+        try:
+            by_type = {}
+            for o in await retry(self.exchange.fetch_open_orders, symbol):
+                by_type.setdefault(o['type'], []).append(o)
+            ids = self.protective_orders.setdefault(symbol, {})
+            for key, order_type in (('sl_id', 'stop_market'), ('tp_id', 'take_profit_market')):
+                if not by_type.get(order_type):
+                    continue
+                # Track the newest; older duplicates would fire at stale prices
+                *stale, newest = by_type[order_type]
+                for order in stale:
+                    await self.cancel_order_by_id(symbol, order['id'])
+                ids[key] = newest['id']
+        except Exception as e:
+            logging.error(f"Failed to load open orders for {symbol}: {str(e)}")
+
+    async def cancel_order_by_id(self, symbol, order_id):
+        try:
+            await retry(self.exchange.cancel_order, order_id, symbol)
+            logging.info(
+                "Cancelled existing order %s for %s",
+                order_id,
+                symbol,
+                extra={'symbol': symbol, 'order_id': order_id},
+            )
+        except ccxt.OrderNotFound:
+            pass  # Already triggered or cancelled on the exchange
+
+    async def cancel_protective_order(self, symbol, key):
+        # Cancel the SL ('sl_id') or TP ('tp_id') placed earlier by id; no open-orders
+        # scan needed, and SL and TP placement never touch each other's order
+        old_id = self.protective_orders.get(symbol, {}).get(key)
+        if old_id:
+            await self.cancel_order_by_id(symbol, old_id)
+            self.protective_orders[symbol].pop(key, None)
+
     async def get_position_amt(self, symbol):
         try:
-            symbol_formatted = symbol.replace('/', '')  # e.g., BTC/USDT -> BTCUSDT
-            positions = await retry(self.exchange.fetch_positions, [symbol_formatted])
-            for p in positions:
-                if p['symbol'] == symbol_formatted:
-                    return float(p['contracts']) if p['contracts'] else 0.0
-            return 0.0
+            symbol_formatted = symbol_ids[symbol]
+            amounts = await self.fetch_position_amounts()
+            return amounts.get(symbol_formatted, 0.0)
         except Exception as e:
             logging.error(f"Failed to fetch position for {symbol}: {str(e)}")
             return 0.0
 
+    async def get_position_amts(self, symbols):
+        # {symbol: contracts} for several symbols out of one fetch_positions snapshot
+        try:
+            amounts = await self.fetch_position_amounts()
+        except Exception as e:
+            logging.error(f"Failed to fetch positions: {str(e)}")
+            amounts = {}
+        return {symbol: amounts.get(symbol_ids[symbol], 0.0) for symbol in symbols}
+
     async def confirm_position(self, symbol):
         pos_amt = await self.get_position_amt(symbol)
         return pos_amt > 0
@@ -165,12 +521,19 @@ class BinanceClient:
     async def create_market_order(self, symbol, side, amount):
         try:
             market_info = await self.get_market_info(symbol)
-            amount = round(amount, market_info['quantity_precision'])
-            if amount < market_info['min_quantity']:
-                logging.error(f"Quantity {amount} below minimum {market_info['min_quantity']} for {symbol}")
+            amount = round(amount, market_info.quantity_precision)
+            if amount < market_info.min_quantity:
+                logging.error(f"Quantity {amount} below minimum {market_info.min_quantity} for {symbol}")
                 return None
-            logging.info(f"Sending {side.upper()} market order: {amount} {symbol}")
+            logging.info(
+                "Sending %s market order: %s %s",
+                side.upper(),
+                amount,
+                symbol,
+                extra={'symbol': symbol, 'order_type': 'market', 'side': side, 'qty': amount},
+            )
             order = await retry(self.exchange.create_order, symbol, 'market', side, amount)
+            self.invalidate_positions()
             return order
         except ccxt.InvalidOrder as e:
             logging.error(f"Invalid market order for {symbol}: {str(e)}")
@@ -182,21 +545,27 @@ class BinanceClient:
     async def create_stop_loss(self, symbol, side, quantity, stop_price):
         try:
             market_info = await self.get_market_info(symbol)
-            stop_price = round_to_tick(stop_price, market_info['tick_size'])
-            quantity = round(quantity, market_info['quantity_precision'])
+            stop_price = round_to_tick(
+                stop_price, market_info.tick_size, market_info.inv_tick
+            )
+            quantity = round(quantity, market_info.quantity_precision)
             opposite = 'sell' if side == 'buy' else 'buy'
-            logging.info(
+            await self.cancel_protective_order(symbol, 'sl_id')
+            logging.info(
                 "%s: Creating STOP_MARKET @ %.2f (qty=%s)",
                 symbol,
                 stop_price,
                 quantity,
+                extra={'symbol': symbol, 'order_type': 'stop_market', 'side': opposite,
+                       'qty': quantity, 'price': stop_price},
             )
             params = {
                 'stopPrice': stop_price,
                 'reduceOnly': True,
                 'timeInForce': 'GTC'
             }
-            await retry(self.exchange.create_order, symbol, 'stop_market', opposite, quantity, None, params)
+            order = await retry(self.exchange.create_order, symbol, 'stop_market', opposite, quantity, None, params)
+            self.protective_orders.setdefault(symbol, {})['sl_id'] = order['id']
         except ccxt.InvalidOrder as e:
             logging.error(f"Failed to create SL for {symbol}: Invalid order - {str(e)}")
         except ccxt.NetworkError as e:
@@ -207,27 +576,27 @@ class BinanceClient:
     async def create_take_profit(self, symbol, side, quantity, tp_price):
         try:
             market_info = await self.get_market_info(symbol)
-            tp_price = round_to_tick(tp_price, market_info['tick_size'])
-            quantity = round(quantity, market_info['quantity_precision'])
+            tp_price = round_to_tick(
+                tp_price, market_info.tick_size, market_info.inv_tick
+            )
+            quantity = round(quantity, market_info.quantity_precision)
             opposite = 'sell' if side == 'buy' else 'buy'
-            # Cancel existing SL/TP orders
-            open_orders = await retry(self.exchange.fetch_open_orders, symbol)
-            for o in open_orders:
-                if o['type'] in ['stop_market', 'take_profit_market'] and o['symbol'] == symbol.replace('/', ''):
-                    await retry(self.exchange.cancel_order, o['id'], symbol)
-                    logging.info(f"Cancelled existing order {o['id']} for {symbol}")
+            await self.cancel_protective_order(symbol, 'tp_id')
             logging.info(
                 "%s: Creating TAKE_PROFIT_MARKET @ %.2f (qty=%s)",
                 symbol,
                 tp_price,
                 quantity,
+                extra={'symbol': symbol, 'order_type': 'take_profit_market', 'side': opposite,
+                       'qty': quantity, 'price': tp_price},
             )
             params = {
                 'stopPrice': tp_price,
                 'reduceOnly': True,
                 'timeInForce': 'GTC'
             }
-            await retry(self.exchange.create_order, symbol, 'take_profit_market', opposite, quantity, None, params)
+            order = await retry(self.exchange.create_order, symbol, 'take_profit_market', opposite, quantity, None, params)
+            self.protective_orders.setdefault(symbol, {})['tp_id'] = order['id']
         except ccxt.InvalidOrder as e:
             logging.error(f"Failed to create TP for {symbol}: Invalid order - {str(e)}")
         except ccxt.NetworkError as e:
@@ -236,105 +605,353 @@ class BinanceClient:
             logging.error(f"Failed to create TP for {symbol}: {str(e)}")
 
     async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.stream_exchange.close()
+        await self.account_stream.close()
         await self.exchange.close()
-        await self.live_exchange.close()
+        if self.live_exchange is not self.exchange:
+            await self.live_exchange.close()
+        await self.session.close()
+
+# Indicator kernels
+# NaN must survive the warm-up bars, so the nnan/ninf fast-math flags stay off
+_FASTMATH = {'contract', 'arcp', 'nsz', 'reassoc'}
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _ema_step(x, i, length, state):
+    # state = [ema, seed_sum, seed_count]. Like pandas_ta, the EMA is seeded
+    # with the mean of the first `length` bars, then follows alpha = 2/(n+1)
+    if i < length:
+        if not np.isnan(x):
+            state[1] += x
+            state[2] += 1.0
+        if i == length - 1 and state[2] > 0.0:
+            state[0] = state[1] / state[2]
+        return state[0]
+    if not np.isnan(x):
+        if np.isnan(state[0]):
+            state[0] = x
+        else:
+            state[0] += 2.0 / (length + 1) * (x - state[0])
+    return state[0]
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _sma_step(x, i, window, state):
+    # state = [finite_sum, nan_count] over the ring buffer `window`. Like
+    # pandas rolling(min_periods=n), any NaN in the window yields NaN.
+    slot = i % window.shape[0]
+    old = window[slot]
+    if np.isnan(old):
+        state[1] -= 1.0
+    else:
+        state[0] -= old
+    window[slot] = x
+    if np.isnan(x):
+        state[1] += 1.0
+    else:
+        state[0] += x
+    if state[1] > 0.0:
+        return np.nan
+    return state[0] / window.shape[0]
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _rma_step(x, length, state):
+    # state = [weighted_sum, weight_sum, count]. Wilder smoothing the way
+    # pandas_ta's rma gets it from ewm(alpha=1/n, adjust=True, min_periods=n)
+    decay = 1.0 - 1.0 / length
+    state[0] = x + decay * state[0]
+    state[1] = 1.0 + decay * state[1]
+    state[2] += 1.0
+    if state[2] < length:
+        return np.nan
+    return state[0] / state[1]
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _channel_index(src, esa, de):
+    # Flat data drives de to 0: pandas silently produced inf/NaN here and numba
+    # would raise ZeroDivisionError, so clamp it. NaN (warm-up) passes through.
+    if de < 1e-12:
+        de = 1e-12
+    return (src - esa) / (0.015 * de)
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _wavetrend_step(high, low, close, i, channel_len, avg_len, esa_state, de_state, ci_state, window, sma_state):
+    # One bar of hlc3 -> esa -> de -> ci -> wt1 -> wt2, shared by the bulk and streaming paths
+    src = (high + low + close) / 3.0
+    esa = _ema_step(src, i, channel_len, esa_state)
+    de = _ema_step(abs(src - esa), i, channel_len, de_state)
+    ci = _channel_index(src, esa, de)
+    wt1 = _ema_step(ci, i, avg_len, ci_state)
+    return wt1, _sma_step(wt1, i, window, sma_state)
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _wavetrend(high, low, close, start, channel_len, avg_len, esa_state, de_state, ci_state, window, sma_state):
+    # Single pass over the bars computing hlc3, esa, de, ci, wt1 and wt2 together,
+    # continuing from the given states; bar k is bar start + k of the series
+    n = close.shape[0]
+    wt1 = np.empty(n)
+    wt2 = np.empty(n)
+    for k in range(n):
+        wt1[k], wt2[k] = _wavetrend_step(
+            high[k], low[k], close[k], start + k, channel_len, avg_len,
+            esa_state, de_state, ci_state, window, sma_state
+        )
+    return wt1, wt2, wt1 - wt2
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _rsi_step(close, length, state):
+    # state = [prev_close, gain rma state (3), loss rma state (3)]
+    change = close - state[0]
+    state[0] = close
+    if np.isnan(change):
+        return np.nan
+    gain = _rma_step(max(change, 0.0), length, state[1:4])
+    loss = _rma_step(max(-change, 0.0), length, state[4:7])
+    total = gain + loss
+    if total == 0.0:
+        return np.nan
+    return 100.0 * gain / total
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _mfi_step(high, low, close, volume, i, state, pos_window, pos_state, neg_window, neg_state):
+    # state = [prev_tp]. Rolling means of the money flow stand in for the
+    # sums; their ratio is the same
+    tp = (high + low + close) / 3.0
+    flow = tp * volume
+    pos = _sma_step(flow if tp > state[0] else 0.0, i, pos_window, pos_state)
+    neg = _sma_step(flow if tp < state[0] else 0.0, i, neg_window, neg_state)
+    state[0] = tp
+    total = pos + neg
+    if total == 0.0:
+        return np.nan
+    return 100.0 * pos / total
 
 # Strategy functions
 def calculate_wavetrend(df, channel_len=9, avg_len=12, ma_len=3):
-    df['hlc3'] = (df['high'] + df['low'] + df['close']) / 3
-    src = df['hlc3']
-    esa = ta.ema(src, length=channel_len)
-    de = ta.ema(abs(src - esa), length=channel_len)
-    ci = (src - esa) / (0.015 * de)
-    wt1 = ta.ema(ci, length=avg_len)
-    wt2 = ta.sma(wt1, length=ma_len)
-    wt_vwap = wt1 - wt2
-    return wt1, wt2, wt_vwap
-
-def find_divergences(series, price, ob_level, os_level):
-    fractal_top = (
-        (series.shift(4) < series.shift(2))
-        & (series.shift(3) < series.shift(2))
-        & (series.shift(2) > series.shift(1))
-        & (series.shift(2) > series)
-    )
-    fractal_bot = (
-        (series.shift(4) > series.shift(2))
-        & (series.shift(3) > series.shift(2))
-        & (series.shift(2) < series.shift(1))
-        & (series.shift(2) < series)
-    )
-    bear_div = (
-        fractal_top
-        & (price.shift(2) > price.shift(4))
-        & (series.shift(2) < series.shift(4))
-        & (series.shift(2) >= ob_level)
-    )
-    bull_div = (
-        fractal_bot
-        & (price.shift(2) < price.shift(4))
-        & (series.shift(2) > series.shift(4))
-        & (series.shift(2) <= os_level)
-    )
-    return bear_div, bull_div
-
-async def set_sl(client, symbol):
+    # Contiguous float64 inputs keep the kernel on a single compiled signature
+    high = np.ascontiguousarray(df['high'], dtype=np.float64)
+    low = np.ascontiguousarray(df['low'], dtype=np.float64)
+    close = np.ascontiguousarray(df['close'], dtype=np.float64)
+    # Plain ndarrays; callers wrap them in a Series only where they need one
+    return WaveTrendState(channel_len, avg_len, ma_len).warmup(high, low, close)
+
+# Incremental WaveTrend: O(1) per closed candle instead of recomputing the window
+class WaveTrendState:
+    def __init__(self, channel_len=9, avg_len=12, ma_len=3):
+        self.channel_len = channel_len
+        self.avg_len = avg_len
+        self.ma_len = ma_len
+        self.bars = 0
+        # Same [ema, seed_sum, seed_count] layout as the bulk kernel
+        self._esa = np.array([np.nan, 0.0, 0.0])
+        self._de = np.array([np.nan, 0.0, 0.0])
+        self._ci = np.array([np.nan, 0.0, 0.0])
+        self._window = np.full(ma_len, np.nan)
+        self._sma = np.array([0.0, float(ma_len)])
+
+    def update(self, high, low, close):
+        wt1, wt2 = _wavetrend_step(
+            high, low, close, self.bars, self.channel_len, self.avg_len,
+            self._esa, self._de, self._ci, self._window, self._sma
+        )
+        self.bars += 1
+        return wt1, wt2, wt1 - wt2
+
+    def warmup(self, high, low, close):
+        # Backfill several bars in one bulk kernel call; returns wt1, wt2 and
+        # wt1 - wt2 arrays for those bars
+        result = _wavetrend(
+            high, low, close, self.bars, self.channel_len, self.avg_len,
+            self._esa, self._de, self._ci, self._window, self._sma
+        )
+        self.bars += len(close)
+        return result
+
+# Incremental RSI, matching pandas_ta's rsi
+class RSIState:
+    def __init__(self, length=14):
+        self.length = length
+        self._state = np.zeros(7)
+        self._state[0] = np.nan  # no previous close yet
+
+    def update(self, close):
+        return _rsi_step(close, self.length, self._state)
+
+# Incremental MFI, matching pandas_ta's mfi
+class MFIState:
+    def __init__(self, length=14):
+        self.bars = 0
+        self._state = np.array([np.nan])  # previous typical price
+        self._pos_window = np.full(length, np.nan)
+        self._pos = np.array([0.0, float(length)])
+        self._neg_window = np.full(length, np.nan)
+        self._neg = np.array([0.0, float(length)])
+
+    def update(self, high, low, close, volume):
+        mfi = _mfi_step(
+            high, low, close, volume, self.bars, self._state,
+            self._pos_window, self._pos, self._neg_window, self._neg
+        )
+        self.bars += 1
+        return mfi
+
+# Indicators for one (symbol, timeframe), advanced once per closed candle
+class IndicatorState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.states = (
+            WaveTrendState(wt_channel_len, wt_average_len, wt_ma_len),
+            RSIState(rsi_length),
+            MFIState(mfi_period),
+        )
+        self.last_closed = None  # open time of the newest candle folded into the states
+        self.history = deque(maxlen=candle_buffer)  # (wt1, wt2, rsi, mfi) per closed candle
+
+    def _commit(self, high, low, close, volume):
+        # Closed candles: WaveTrend goes through the bulk kernel in one call
+        wavetrend, rsi, mfi = self.states
+        wt1, wt2, _ = wavetrend.warmup(high, low, close)
+        for k in range(len(close)):
+            self.history.append((wt1[k], wt2[k], rsi.update(close[k]), mfi.update(high[k], low[k], close[k], volume[k])))
+
+    @staticmethod
+    def _update(states, high, low, close, volume):
+        wavetrend, rsi, mfi = states
+        wt1, wt2, _ = wavetrend.update(high, low, close)
+        return wt1, wt2, rsi.update(close), mfi.update(high, low, close, volume)
+
+    def series(self, df):
+        # Returns wt1, wt2, rsi and mfi arrays aligned with df. Candles that closed
+        # since the last call are folded into the states; the forming last candle
+        # is evaluated on a copy so the next call can revise it.
+        times = df['timestamp'].to_numpy()
+        high = df['high'].to_numpy()
+        low = df['low'].to_numpy()
+        close = df['close'].to_numpy()
+        volume = df['volume'].to_numpy()
+        n = len(df)
+        # A frame starting after last_closed means candles were missed while the
+        # symbol went unscanned; carrying the states across that gap would treat
+        # the missing bars as adjacent, so rebuild cold from this frame
+        if self.last_closed is not None and times[0] > self.last_closed:
+            self.reset()
+        # Closed candles newer than last_closed form a run ending at the forming one
+        start = 0 if self.last_closed is None else int(np.searchsorted(times[:n - 1], self.last_closed, side='right'))
+        if start < n - 1:
+            self._commit(high[start:n - 1], low[start:n - 1], close[start:n - 1], volume[start:n - 1])
+            self.last_closed = times[n - 2]
+        forming = self._update(copy.deepcopy(self.states), high[-1], low[-1], close[-1], volume[-1])
+        closed = list(islice(self.history, max(0, len(self.history) - (n - 1)), None))
+        values = np.full((n, 4), np.nan)
+        if closed:
+            values[n - 1 - len(closed):n - 1] = closed
+        values[-1] = forming
+        return values[:, 0], values[:, 1], values[:, 2], values[:, 3]
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _divergences(s, p, ob_level, os_level, start, bear, bull):
+    # sK is the value K bars back; the first 4 bars have no complete fractal window
+    for i in range(start + 4, len(s)):
+        s0, s1, s2, s3, s4 = s[i], s[i - 1], s[i - 2], s[i - 3], s[i - 4]
+        p2, p4 = p[i - 2], p[i - 4]
+        bear[i] = (s2 >= ob_level and s4 < s2 and s3 < s2 and s2 > s1 and s2 > s0
+                   and p2 > p4 and s2 < s4)
+        bull[i] = (s2 <= os_level and s4 > s2 and s3 > s2 and s2 < s1 and s2 < s0
+                   and p2 < p4 and s2 > s4)
+
+def find_divergences(series, price, ob_level, os_level, tail=None):
+    # With tail set, only the last `tail` bars are evaluated and earlier ones stay False
+    s = series.to_numpy(dtype=np.float64)
+    p = price.to_numpy(dtype=np.float64)
+    bear_div = np.zeros(len(s), dtype=bool)
+    bull_div = np.zeros(len(s), dtype=bool)
+    start = 0 if tail is None else max(0, len(s) - tail - 4)
+    _divergences(s, p, float(ob_level), float(os_level), start, bear_div, bull_div)
+    return pd.Series(bear_div, index=series.index), pd.Series(bull_div, index=series.index)
+
+def crosses_at(wt1, wt2, i, cfg):
+    # (cross_up, cross_down) for bar i as scalars; bars before the
+    # start compare as NaN, like the shift()-based masks they replace
+    if i < 1:
+        return False, False
+    cross_up = wt1[i - 1] < wt2[i - 1] and wt1[i] > wt2[i] and wt2[i] <= cfg.os_level
+    cross_down = wt1[i - 1] > wt2[i - 1] and wt1[i] < wt2[i] and wt2[i] >= cfg.ob_level
+    return cross_up, cross_down
+
+def gold_at(wt2, rsi, bull_div, i, cfg):
+    return i >= 2 and bull_div[i] and wt2[i - 2] <= cfg.os_level3 and wt2[i] > cfg.os_level3 and rsi[i - 2] < rsi_oversold
+
+# Entry of the open position per symbol, kept in last_trade; tp/sl are fixed at entry
+Trade = namedtuple('Trade', ['entry_price', 'side', 'quantity', 'tp', 'sl'])
+
+def open_trade(entry_price, side, quantity, cfg):
+    return Trade(entry_price, side, quantity, *calculate_tp_sl(entry_price, side, cfg))
+
+async def set_sl(client, symbol, cfg):
+    trade = last_trade.get(symbol)
+    if not trade or not trade.quantity:
+        logging.error(f"No trade data for {symbol} to set SL")
+        return
+    # The price was fixed at entry; only the order is retried
+    entry_price, side, qty, _, sl = trade
+    # Validate SL price
+    if abs(sl - entry_price) / entry_price > max_protect_dist:
+        sl = entry_price * (1 - max_protect_dist if side == 'buy' else 1 + max_protect_dist)
+        logging.warning(f"Adjusted SL for {symbol} to {sl:.2f} due to excessive distance")
+    if sl < min_price:  # Ensure SL is realistic
+        logging.error(f"Invalid SL price {sl:.2f} for {symbol}, skipping")
+        return
     for _ in range(2):
-        if not last_trade.get(symbol) or not last_trade[symbol].get('quantity'):
-            logging.error(f"No trade data for {symbol} to set SL")
-            return
         try:
-            entry_price = last_trade[symbol]['entry_price']
-            side = last_trade[symbol]['side']
-            qty = last_trade[symbol]['quantity']
-            tp, sl = calculate_tp_sl(symbol)
-            # Validate SL price
-            if abs(sl - entry_price) / entry_price > 0.05:
-                sl = entry_price * (0.95 if side == 'buy' else 1.05)
-                logging.warning(f"Adjusted SL for {symbol} to {sl:.2f} due to excessive distance")
-            if sl < 50000:  # Ensure SL is realistic
-                logging.error(f"Invalid SL price {sl:.2f} for {symbol}, skipping")
-                return
-            await client.create_stop_loss(symbol, side, qty, sl)
+            await client.create_stop_loss(symbol, side, qty, sl)
             return
         except Exception as e:
             logging.error(f"Failed to set SL for {symbol}: {str(e)}")
             await asyncio.sleep(2)
 
-async def set_tp(client, symbol):
+async def set_tp(client, symbol, cfg):
+    trade = last_trade.get(symbol)
+    if not trade or not trade.quantity:
+        logging.error(f"No trade data for {symbol} to set TP")
+        return
+    # The price was fixed at entry; only the order is retried
+    entry_price, side, qty, tp, _ = trade
+    # Validate TP price
+    if abs(tp - entry_price) / entry_price > max_protect_dist:
+        tp = entry_price * (1 + max_protect_dist if side == 'buy' else 1 - max_protect_dist)
+        logging.warning(f"Adjusted TP for {symbol} to {tp:.2f} due to excessive distance")
+    if tp < min_price:  # Ensure TP is realistic
+        logging.error(f"Invalid TP price {tp:.2f} for {symbol}, skipping")
+        return
     for _ in range(2):
-        if not last_trade.get(symbol) or not last_trade[symbol].get('quantity'):
-            logging.error(f"No trade data for {symbol} to set TP")
-            return
         try:
-            entry_price = last_trade[symbol]['entry_price']
-            side = last_trade[symbol]['side']
-            qty = last_trade[symbol]['quantity']
-            tp, sl = calculate_tp_sl(symbol)
-            # Validate TP price
-            if abs(tp - entry_price) / entry_price > 0.05:
-                tp = entry_price * (1.05 if side == 'buy' else 0.95)
-                logging.warning(f"Adjusted TP for {symbol} to {tp:.2f} due to excessive distance")
-            if tp < 50000:  # Ensure TP is realistic
-                logging.error(f"Invalid TP price {tp:.2f} for {symbol}, skipping")
-                return
-            await client.create_take_profit(symbol, side, qty, tp)
+            await client.create_take_profit(symbol, side, qty, tp)
             return
         except Exception as e:
             logging.error(f"Failed to set TP for {symbol}: {str(e)}")
             await asyncio.sleep(2)
 
-def calculate_tp_sl(symbol):
-    entry = last_trade[symbol]['entry_price']
-    side = last_trade[symbol]['side']
-    lev = leverage
-    tp = entry * (1 + tp_pct / lev) if side == 'buy' else entry * (1 - tp_pct / lev)
-    sl = entry * (1 - sl_pct / lev) if side == 'buy' else entry * (1 + sl_pct / lev)
+def calculate_tp_sl(entry, side, cfg):
+    lev = cfg.leverage
+    tp = entry * (1 + cfg.tp_pct / lev) if side == 'buy' else entry * (1 - cfg.tp_pct / lev)
+    sl = entry * (1 - cfg.sl_pct / lev) if side == 'buy' else entry * (1 + cfg.sl_pct / lev)
     return tp, sl
 
-async def trading_loop():
-    api_key = os.environ.get("BINANCE_API_KEY")
-    api_secret = os.environ.get("BINANCE_API_SECRET")
+async def fetch_scan_inputs(client, scan_symbols):
+    # Balance plus candles for every timeframe of the symbols that will scan for entries
+    if not scan_symbols:
+        return 0.0, {}
+    pairs = [(s, tf) for s in scan_symbols for tf in timeframes]
+    balance, frames = await asyncio.gather(
+        client.fetch_balance(), client.fetch_ohlcv_many(pairs)
+    )
+    return balance, dict(zip(pairs, frames))
+
+async def trading_loop(cfg):
     if not api_key or not api_secret:
         logging.error(
             "BINANCE_API_KEY and BINANCE_API_SECRET environment variables are required"
@@ -344,194 +961,228 @@ async def trading_loop():
     global last_trade
 
     # Track cooldown and open positions per symbol
-    cooling_until  = {symbol: None for symbol in symbols}
+    # Deadlines are time.monotonic() values, so clock adjustments can't end a
+    # cooldown early; cooling_ends keeps the wall-clock time for the logs
+    cooling_until  = {symbol: 0.0 for symbol in symbols}
+    cooling_ends   = {}
     position_open  = {symbol: False for symbol in symbols}
-    last_trade     = {}  # {'entry_price', 'side', 'quantity'}
+    last_trade     = {}  # {symbol: Trade}
+    indicators     = {}  # {(symbol, timeframe): IndicatorState}
+    # Symbols scan concurrently off one balance read per cycle; entries check and
+    # reserve their margin under entry_lock so they can't all spend the same funds
+    entry_lock      = asyncio.Lock()
+    margin_reserved = 0.0
 
-    try:
-        balance = await client.fetch_balance()
-        logging.info("✅ Conexão verificada! Saldo disponível: %s", balance)
+    def start_cooldown(symbol, now):
+        cooling_until[symbol] = now + cooldown.total_seconds()
+        cooling_ends[symbol] = datetime.now() + cooldown
 
-        while True:
-            now = datetime.now()
-
-            for symbol in symbols:
-                # Skip if cooling down
-                if cooling_until[symbol] and now < cooling_until[symbol]:
-                    logging.info(
-                        "%s: Cooling down until %s. Skipping.",
-                        symbol,
-                        cooling_until[symbol],
-                    )
-                    continue
-
-                # Update position status
-                pos_amt = await client.get_position_amt(symbol)
-                if pos_amt > 0:
-                    position_open[symbol] = True
-                elif pos_amt == 0 and position_open[symbol]:
-                    # Position closed; compute PnL and set cooldown
-                    one_min_df = await client.fetch_ohlcv(symbol, '1m', limit=1)
-                    if one_min_df.empty:
-                        logging.error(f"Failed to fetch exit price for {symbol}")
-                        position_open[symbol] = False
-                        continue
-                    exit_price = one_min_df['close'].iloc[-1]
-                    info = last_trade.get(symbol, {})
-                    if not info:
-                        logging.error(f"No trade info for closed position {symbol}")
-                        position_open[symbol] = False
-                        continue
-                    entry_price = info['entry_price']
-                    side = info['side']
-                    qty = info['quantity']
-                    pnl = ((exit_price - entry_price) if side == 'buy' else (entry_price - exit_price)) * qty
-                    commission = (entry_price * qty + exit_price * qty) * commission_pct
-                    pnl_net = pnl - commission
-                    pnl_pct = (pnl_net / (entry_price * qty)) * 100
-                    logging.info(
-                        f"{symbol} Trade closed: side={side}, entry={entry_price}, "
-                        f"exit={exit_price}, qty={qty}, PnL_net={pnl_net:.2f} USDT ({pnl_pct:.2f}%), "
-                        f"Commission={commission:.2f}"
-                    )
-                    cooling_until[symbol] = now + timedelta(minutes=30)
-                    position_open[symbol] = False
-                    last_trade.pop(symbol, None)
-                    logging.info(
-                        "%s: Position closed. Cooling down until %s.",
-                        symbol,
-                        cooling_until[symbol],
-                    )
-                    continue
-
-                # If no open position, scan timeframes for signals
-                if not position_open[symbol]:
-                    # Check balance before trading
-                    balance = await client.fetch_balance()
-                    if balance < fixed_position_size_usd:
-                        logging.error(f"Insufficient balance: {balance} USDT for {symbol}")
+    async def scan_symbol(symbol, now, balance, pos_amts, frames):
+        # One symbol's share of a cycle; symbols run concurrently so an order
+        # in flight for one doesn't hold up the others
+        nonlocal margin_reserved
+
+        # Skip if cooling down
+        if now < cooling_until[symbol]:
+            logging.info(
+                "%s: Cooling down until %s. Skipping.",
+                symbol,
+                cooling_ends[symbol],
+            )
+            return
+
+        # Update position status
+        pos_amt = pos_amts[symbol]
+        if pos_amt > 0:
+            position_open[symbol] = True
+        elif pos_amt == 0 and position_open[symbol]:
+            # Position closed; compute PnL and set cooldown
+            one_min_df = await client.fetch_ohlcv(symbol, '1m', limit=1)
+            if one_min_df.empty:
+                logging.error(f"Failed to fetch exit price for {symbol}")
+                position_open[symbol] = False
+                return
+            exit_price = one_min_df['close'].iloc[-1]
+            info = last_trade.get(symbol)
+            if not info:
+                logging.error(f"No trade info for closed position {symbol}")
+                position_open[symbol] = False
+                return
+            entry_price, side, qty, _, _ = info
+            pnl = ((exit_price - entry_price) if side == 'buy' else (entry_price - exit_price)) * qty
+            commission = (entry_price * qty + exit_price * qty) * cfg.commission_pct
+            pnl_net = pnl - commission
+            pnl_pct = (pnl_net / (entry_price * qty)) * 100
+            logging.info(
+                f"{symbol} Trade closed: side={side}, entry={entry_price}, "
+                f"exit={exit_price}, qty={qty}, PnL_net={pnl_net:.2f} USDT ({pnl_pct:.2f}%), "
+                f"Commission={commission:.2f}"
+            )
+            start_cooldown(symbol, now)
+            position_open[symbol] = False
+            last_trade.pop(symbol, None)
+            logging.info(
+                "%s: Position closed. Cooling down until %s.",
+                symbol,
+                cooling_ends[symbol],
+            )
+            return
+
+        # If no open position, scan timeframes for signals
+        if not position_open[symbol]:
+            # Check balance before trading
+            if balance < cfg.fixed_size_usd:
+                logging.error(f"Insufficient balance: {balance} USDT for {symbol}")
+                return
+
+            for timeframe in timeframes:
+                df = frames[symbol, timeframe]
+                try:
+                    if df.empty:
+                        logging.warning(f"No data returned for {symbol} on {timeframe}")
                         continue
+                    # Indicators stay local so the fetched frame is never mutated;
+                    # only candles closed since the last cycle are computed
+                    state = indicators.get((symbol, timeframe))
+                    if state is None:
+                        state = indicators[symbol, timeframe] = IndicatorState()
+                    wt1, wt2, rsi, mfi = state.series(df)
+                    mfi = mfi * mfi_multiplier - 2.5
+                    last_close = df['close'].iat[-1]
 
-                    for timeframe in timeframes:
-                        try:
-                            df = await client.fetch_ohlcv(symbol, timeframe)
-                            if df.empty:
-                                logging.warning(f"No data returned for {symbol} on {timeframe}")
-                                continue
-                            df['rsi'] = ta.rsi(df['close'], length=rsi_length)
-                            df['mfi'] = (
-                                ta.mfi(df['high'], df['low'], df['close'], df['volume'], length=mfi_period)
-                                * mfi_multiplier - 2.5
-                            )
-                            wt1, wt2, wt_vwap = calculate_wavetrend(
-                                df, wt_channel_len, wt_average_len, wt_ma_len
-                            )
-                            df['wt1'] = wt1
-                            df['wt2'] = wt2
-                            df['wt_vwap'] = wt_vwap
-
-                            wt_cross = (
-                                (df['wt1'].shift(1) < df['wt2'].shift(1))
-                                & (df['wt1'] > df['wt2'])
-                            )
-                            wt_cross_up = wt_cross & (df['wt2'] <= os_level)
-                            wt_cross_down = (
-                                (df['wt1'].shift(1) > df['wt2'].shift(1))
-                                & (df['wt1'] < df['wt2'])
-                                & (df['wt2'] >= ob_level)
-                            )
-                            wt_bear_div, wt_bull_div = find_divergences(
-                                df['wt2'], df['close'], wt_div_ob, wt_div_os
-                            )
-
-                            last_rsi = df['rsi'].shift(2)
-                            wt_gold = (
-                                wt_bull_div
-                                & (df['wt2'].shift(2) <= os_level3)
-                                & (df['wt2'] > os_level3)
-                                & (last_rsi < 30)
-                            )
-
-                            buySignal = wt_cross_up & ~wt_gold
-                            sellSignal = wt_cross_down
-
-                            # Debug prints
-                            logging.debug("[%s@%s] Price: %s, WT2: %s, WT1: %s (cross_up: %s, cross_down: %s), Divergências - Bull: %s, Bear: %s, Gold: %s, RSI: %s, MFI: %s", symbol, timeframe, df["close"].iloc[-1], df["wt2"].iloc[-1], df["wt1"].iloc[-1], wt_cross_up.iloc[-1], wt_cross_down.iloc[-1], wt_bull_div.iloc[-1], wt_bear_div.iloc[-1], wt_gold.iloc[-1], df["rsi"].iloc[-1], df["mfi"].iloc[-1])
-
-                            pos_amt_check = await client.get_position_amt(symbol)
-                            if pos_amt_check == 0:
-                                entry_price = df['close'].iloc[-1]
-                                # Validate entry price
-                                if entry_price < 50000:
-                                    logging.warning(f"Skipping trade for {symbol} on {timeframe}: Unrealistic price {entry_price}")
-                                    continue
-                                market_info = await client.get_market_info(symbol)
-                                quantity = round((fixed_position_size_usd * leverage) / entry_price, market_info['quantity_precision'])
-                                if buySignal.iloc[-1] or buySignal.iloc[-2]:
-                                    logging.info(f"🔔 {symbol} Long signal detected on {timeframe}")
-                                    order = await client.create_market_order(symbol, 'buy', quantity)
-                                    if order and order.get('status') == 'closed':
-                                        await asyncio.sleep(1)  # Wait for position to register
-                                        if await client.confirm_position(symbol):
-                                            last_trade[symbol] = {
-                                                'entry_price': entry_price,
-                                                'side': 'buy',
-                                                'quantity': quantity
-                                            }
-                                            position_open[symbol] = True
-                                            await set_sl(client, symbol)
-                                            await set_tp(client, symbol)
-                                            break
-                                        else:
-                                            logging.error(f"Failed to confirm position for {symbol} after buy order")
-                                            continue
-                                    else:
-                                        logging.error(f"Failed to create buy order for {symbol}")
-                                        continue
-
-                                elif sellSignal.iloc[-1] or sellSignal.iloc[-2]:
-                                    logging.info(f"🔔 {symbol} Short signal detected on {timeframe}")
-                                    order = await client.create_market_order(symbol, 'sell', quantity)
-                                    if order and order.get('status') == 'closed':
-                                        await asyncio.sleep(1)  # Wait for position to register
-                                        if await client.confirm_position(symbol):
-                                            last_trade[symbol] = {
-                                                'entry_price': entry_price,
-                                                'side': 'sell',
-                                                'quantity': quantity
-                                            }
-                                            position_open[symbol] = True
-                                            await set_sl(client, symbol)
-                                            await set_tp(client, symbol)
-                                            break
-                                        else:
-                                            logging.error(f"Failed to confirm position for {symbol} after sell order")
-                                            continue
-                                    else:
-                                        logging.error(f"Failed to create sell order for {symbol}")
-                                        continue
+                    # Only the last two bars are traded on, so the signals are
+                    # evaluated for those two bars alone
+                    last = len(df) - 1
+                    cross_up, cross_down = crosses_at(wt1, wt2, last, cfg)
+                    prev_up, prev_down = crosses_at(wt1, wt2, last - 1, cfg)
+                    gold = prev_gold = False
+                    debug = logging.root.isEnabledFor(logging.DEBUG)
+                    # Divergences only veto long crosses (and feed the debug line),
+                    # so bars without a cross up skip them
+                    if cross_up or prev_up or debug:
+                        wt_bear_div, wt_bull_div = find_divergences(
+                            pd.Series(wt2, index=df.index), df['close'], cfg.wt_div_ob, cfg.wt_div_os, tail=2
+                        )
+                        wt_bull_div = wt_bull_div.to_numpy()
+                        gold = gold_at(wt2, rsi, wt_bull_div, last, cfg)
+                        prev_gold = gold_at(wt2, rsi, wt_bull_div, last - 1, cfg)
+                    buy_signal = (cross_up and not gold) or (prev_up and not prev_gold)
+                    sell_signal = cross_down or prev_down
+
+                    # Debug prints
+                    if debug:
+                        logging.debug("[%s@%s] Price: %s, WT2: %s, WT1: %s (cross_up: %s, cross_down: %s), Divergências - Bull: %s, Bear: %s, Gold: %s, RSI: %s, MFI: %s", symbol, timeframe, last_close, wt2[-1], wt1[-1], cross_up, cross_down, wt_bull_div[-1], wt_bear_div.iat[-1], gold, rsi[-1], mfi[-1])
 
+                    # Shared positions snapshot: kept current by the account stream, with a
+                    # REST resync every positions_resync seconds (positions_ttl while the
+                    # stream is down); every placed market order drops it, so this re-reads
+                    # REST after an entry on an earlier timeframe of the same cycle
+                    pos_amt_check = await client.get_position_amt(symbol)
+                    if pos_amt_check == 0:
+                        entry_price = last_close
+                        # Validate entry price
+                        if entry_price < min_price:
+                            logging.warning(f"Skipping trade for {symbol} on {timeframe}: Unrealistic price {entry_price}")
+                            continue
+                        market_info = await client.get_market_info(symbol)
+                        quantity = round((cfg.fixed_size_usd * cfg.leverage) / entry_price, market_info.quantity_precision)
+                        if buy_signal:
+                            logging.info(f"🔔 {symbol} Long signal detected on {timeframe}")
+                            async with entry_lock:
+                                if balance - margin_reserved < cfg.fixed_size_usd:
+                                    logging.error(f"Insufficient balance: {balance - margin_reserved} USDT for {symbol}")
+                                    return
+                                order = await client.create_market_order(symbol, 'buy', quantity)
+                                if order:
+                                    margin_reserved += cfg.fixed_size_usd
+                            if order and order.get('status') == 'closed':
+                                await asyncio.sleep(1)  # Wait for position to register
+                                if await client.confirm_position(symbol):
+                                    last_trade[symbol] = open_trade(entry_price, 'buy', quantity, cfg)
+                                    position_open[symbol] = True
+                                    await asyncio.gather(set_sl(client, symbol, cfg), set_tp(client, symbol, cfg))
+                                    break
                                 else:
-                                    logging.info(f"[{symbol}@{timeframe}] 🔍 No valid signal.")
+                                    logging.error(f"Failed to confirm position for {symbol} after buy order")
+                                    continue
                             else:
-                                info = last_trade.get(symbol)
-                                if info:
-                                    current_price = df['close'].iloc[-1]
-                                    tp, _ = calculate_tp_sl(symbol)
-                                    if ((info['side'] == 'buy' and current_price >= tp) or
-                                        (info['side'] == 'sell' and current_price <= tp)):
-                                        await set_tp(client, symbol)
-                                        position_open[symbol] = False
-                                        cooling_until[symbol] = now + timedelta(minutes=30)
-                                        logging.info(f"{symbol} TP order placed at {tp:.2f}. Entering cooldown.")
-                                        last_trade.pop(symbol, None)
+                                logging.error(f"Failed to create buy order for {symbol}")
+                                continue
+
+                        elif sell_signal:
+                            logging.info(f"🔔 {symbol} Short signal detected on {timeframe}")
+                            async with entry_lock:
+                                if balance - margin_reserved < cfg.fixed_size_usd:
+                                    logging.error(f"Insufficient balance: {balance - margin_reserved} USDT for {symbol}")
+                                    return
+                                order = await client.create_market_order(symbol, 'sell', quantity)
+                                if order:
+                                    margin_reserved += cfg.fixed_size_usd
+                            if order and order.get('status') == 'closed':
+                                await asyncio.sleep(1)  # Wait for position to register
+                                if await client.confirm_position(symbol):
+                                    last_trade[symbol] = open_trade(entry_price, 'sell', quantity, cfg)
+                                    position_open[symbol] = True
+                                    await asyncio.gather(set_sl(client, symbol, cfg), set_tp(client, symbol, cfg))
+                                    break
                                 else:
-                                    logging.info(f"[{symbol}@{timeframe}] 🔄 Position already open. Skipping.")
+                                    logging.error(f"Failed to confirm position for {symbol} after sell order")
+                                    continue
+                            else:
+                                logging.error(f"Failed to create sell order for {symbol}")
+                                continue
+
+                        else:
+                            logging.info("[%s@%s] 🔍 No valid signal.", symbol, timeframe)
+                    else:
+                        info = last_trade.get(symbol)
+                        if info:
+                            current_price = last_close
+                            tp = info.tp
+                            if ((info.side == 'buy' and current_price >= tp) or
+                                (info.side == 'sell' and current_price <= tp)):
+                                await set_tp(client, symbol, cfg)
+                                position_open[symbol] = False
+                                start_cooldown(symbol, now)
+                                logging.info(f"{symbol} TP order placed at {tp:.2f}. Entering cooldown.")
+                                last_trade.pop(symbol, None)
+                        else:
+                            logging.info("[%s@%s] 🔄 Position already open. Skipping.", symbol, timeframe)
+
+                except Exception as tf_e:
+                    logging.warning(f"Erro ao processar {symbol} no timeframe {timeframe}: {tf_e}")
+
+    try:
+        balance = await client.fetch_balance()
+        logging.info("✅ Conexão verificada! Saldo disponível: %s", balance)
+        # Markets are loaded once up front so order placement never waits on them
+        await client.load_markets()
+        # Candles come from kline streams from here on; REST only fills in until they are seeded
+        client.start_kline_streams([(s, tf) for s in symbols for tf in timeframes])
+        client.start_keepalive()
+        client.start_position_stream()
+        await asyncio.gather(*(client.load_protective_orders(s) for s in symbols))
+
+        while True:
+            now = time.monotonic()
+            # Closes from here on are newer than the candles this cycle reads
+            client.candle_closed.clear()
+
+            # Phase 1: issue this cycle's exchange reads together
+            ready = [s for s in symbols if now >= cooling_until[s]]
+            pos_amts, (balance, frames) = await asyncio.gather(
+                client.get_position_amts(ready),
+                fetch_scan_inputs(client, [s for s in ready if not position_open[s]]),
+            )
 
-                        except Exception as tf_e:
-                            logging.warning(f"Erro ao processar {symbol} no timeframe {timeframe}: {tf_e}")
+            # Phase 2: act on the results, all symbols concurrently
+            margin_reserved = 0.0
+            await asyncio.gather(*(
+                scan_symbol(s, now, balance, pos_amts, frames) for s in symbols
+            ))
 
-            await asyncio.sleep(60)
+            # Rescan right after a bar closes instead of waiting out the minute
+            await client.wait_candle_close(60)
 
     except Exception as e:
         logging.error("❌ Erro na execução do bot: %s\n%s", e, traceback.format_exc())
@@ -539,4 +1190,13 @@ async def trading_loop():
         await client.close()
 
 if __name__ == "__main__":
-    asyncio.run(trading_loop())
+    # libuv-based event loop when available (not on Windows)
+    try:
+        import uvloop
+    except ImportError:
+        if os.name == 'nt':
+            # aiohttp's DNS resolution and ccxt expect a selector loop, not the Proactor default
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        asyncio.run(trading_loop(strategy))
+    else:
+        uvloop.run(trading_loop(strategy))
@@ -0,0 +1,32 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 7])
+def test_tail_matches_deque(size):
+    rng = np.random.default_rng(size)
+    ring = main.CandleRing(size)
+    expected = deque(maxlen=size)
+    for _ in range(200):
+        candle = list(rng.random(6))
+        # The stream repeats the forming candle, so replace it some of the time
+        if expected and rng.random() < 0.3:
+            ring.replace_last(candle)
+            expected[-1] = candle
+        else:
+            ring.push(candle)
+            expected.append(candle)
+        if rng.random() < 0.05:
+            ring.clear()
+            expected.clear()
+        assert len(ring) == len(expected)
+        for n in range(size + 3):
+            tail = ring.tail(n)
+            want = np.array(list(expected)[max(0, len(expected) - n):]).reshape(-1, 6)
+            np.testing.assert_array_equal(tail, want)
+            # tail() hands out a view, not a copy
+            assert tail.size == 0 or np.shares_memory(tail, ring.rows)
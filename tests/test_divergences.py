@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('tail', [1, 2, 3, 10])
+def test_tail_matches_full_scan(tail):
+    rng = np.random.default_rng(tail)
+    for _ in range(500):
+        n = int(rng.integers(0, 40))
+        series = pd.Series(rng.integers(-100, 100, n).astype(float))
+        price = pd.Series(rng.integers(0, 5, n).astype(float))
+        full_bear, full_bull = main.find_divergences(series, price, 0, 0)
+        bear, bull = main.find_divergences(series, price, 0, 0, tail=tail)
+        k = min(tail, n)
+        for got, full in ((bear, full_bear), (bull, full_bull)):
+            got, full = got.to_numpy(), full.to_numpy()
+            assert len(got) == n
+            np.testing.assert_array_equal(got[n - k:], full[n - k:])
+            # Bars before the tail are never evaluated
+            assert not got[:n - k].any()
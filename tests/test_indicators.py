@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+# Reference formulas, written the way pandas_ta 0.3.14b computes them
+def ref_ema(close, length):
+    close = close.copy()
+    seed = close[0:length].mean()
+    close[:length - 1] = np.nan
+    close.iloc[length - 1] = seed
+    return close.ewm(span=length, adjust=False).mean()
+
+
+def ref_wavetrend(df, channel_len, avg_len, ma_len):
+    src = (df['high'] + df['low'] + df['close']) / 3
+    esa = ref_ema(src, channel_len)
+    de = ref_ema(abs(src - esa), channel_len)
+    ci = (src - esa) / (0.015 * de)
+    wt1 = ref_ema(ci, avg_len)
+    return wt1, wt1.rolling(ma_len, min_periods=ma_len).mean()
+
+
+def ref_rma(close, length):
+    return close.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def ref_rsi(close, length):
+    negative = close.diff()
+    positive = negative.copy()
+    positive[positive < 0] = 0
+    negative[negative > 0] = 0
+    gain = ref_rma(positive, length)
+    loss = ref_rma(negative, length)
+    return 100 * gain / (gain + loss.abs())
+
+
+def ref_mfi(high, low, close, volume, length):
+    tp = (high + low + close) / 3
+    flow = tp * volume
+    change = tp.diff()
+    pos = flow.where(change > 0, 0.0).rolling(length).sum()
+    neg = flow.where(change < 0, 0.0).rolling(length).sum()
+    return 100 * pos / (pos + neg)
+
+
+def reference(df):
+    # WaveTrend from the bulk kernel (checked against the formula above);
+    # RSI and MFI straight from the formulas
+    wt1, wt2, _ = main.calculate_wavetrend(df, main.wt_channel_len, main.wt_average_len, main.wt_ma_len)
+    rsi = ref_rsi(df['close'], main.rsi_length)
+    mfi = ref_mfi(df['high'], df['low'], df['close'], df['volume'], main.mfi_period)
+    return [np.asarray(wt1), np.asarray(wt2), rsi.to_numpy(), mfi.to_numpy()]
+
+
+def make_candles(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 150, n))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2025-01-01', periods=n, freq='15min'),
+        'open': close,
+        'high': close + rng.uniform(0, 200, n),
+        'low': close - rng.uniform(0, 200, n),
+        'close': close,
+        'volume': rng.uniform(1, 100, n),
+    })
+
+
+def assert_matches(got, expected):
+    for g, e in zip(got, expected):
+        g, e = np.asarray(g, dtype=np.float64), np.asarray(e, dtype=np.float64)
+        # Warm-up bars must stay NaN in the same places
+        np.testing.assert_array_equal(np.isnan(g), np.isnan(e))
+        ok = ~np.isnan(e)
+        np.testing.assert_allclose(g[ok], e[ok], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_calculate_wavetrend_matches_reference(seed):
+    df = make_candles(300, seed)
+    wt1, wt2 = ref_wavetrend(df, 9, 12, 3)
+    assert_matches(main.calculate_wavetrend(df), (wt1, wt2, wt1 - wt2))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_cold_start_matches_reference(seed):
+    df = make_candles(100, seed)
+    assert_matches(main.IndicatorState().series(df), reference(df))
+
+
+def test_incremental_updates_match_reference():
+    # A sliding 100-candle window, as the kline stream serves it, advanced a
+    # few closed candles at a time
+    full = make_candles(400, 3)
+    expected = reference(full)
+    state = main.IndicatorState()
+    for end in range(100, 400, 7):
+        got = state.series(full.iloc[end - 100:end].reset_index(drop=True))
+        assert_matches(got, [e[end - 100:end] for e in expected])
+
+
+def test_forming_candle_is_not_committed():
+    df = make_candles(100, 4)
+    state = main.IndicatorState()
+    state.series(df)
+    revised = df.copy()
+    revised.loc[revised.index[-1], 'close'] += 500.0
+    assert_matches(state.series(revised), reference(revised))
+
+
+def test_single_candle():
+    values = main.IndicatorState().series(make_candles(1, 5))
+    assert [v.shape for v in values] == [(1,)] * 4
+
+
+def test_gap_rebuilds_cold():
+    # A frame that doesn't overlap the last committed candle is recomputed
+    # from scratch instead of continuing across the missing bars
+    full = make_candles(400, 6)
+    state = main.IndicatorState()
+    state.series(full.iloc[:100].reset_index(drop=True))
+    later = full.iloc[250:350].reset_index(drop=True)
+    assert_matches(state.series(later), reference(later))